@@ -1,42 +1,208 @@
-import json
+import orjson
 import sqlite3
 import os
+import shutil
 from pathlib import Path
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
 import logging
 import yfinance as yf
+from numba import njit
 from curl_cffi import requests
-from typing import Tuple, Dict, Optional, Set
+from typing import Callable, Tuple, Dict, Iterator, List, Optional, Set
 from io import StringIO
 from bs4 import BeautifulSoup
 import threading
+import functools
+import itertools
+import concurrent.futures
+import queue
+from contextlib import contextmanager
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
-class CustomJSONEncoder(json.JSONEncoder):
+# Moving average settings for sma200/ema200
+MA_WINDOW = 200
+MA_MIN_PERIODS = 50
+
+
+def orjson_default(obj):
+    """
+    orjson fallback for special types like numpy and pandas objects.
+    NumPy scalars/arrays are normally handled by orjson itself via OPT_SERIALIZE_NUMPY.
+    """
+    if isinstance(obj, (datetime, date, pd.Timestamp)):
+        return obj.isoformat()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+@njit(cache=True)
+def _rolling_mean_nb(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """
+    Single-pass equivalent of pd.Series.rolling(window, min_periods).mean().
+    Keeps a running sum/count of the non-NaN values inside the window.
+    """
+    n = values.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    total = 0.0
+    count = 0
+    for i in range(n):
+        x = values[i]
+        if not np.isnan(x):
+            total += x
+            count += 1
+        if i >= window:
+            old = values[i - window]
+            if not np.isnan(old):
+                total -= old
+                count -= 1
+        out[i] = total / count if count >= min_periods else np.nan
+    return out
+
+
+@njit(cache=True)
+def _ewm_mean_nb(values: np.ndarray, span: int, min_periods: int,
+                 seed: float = np.nan, seed_nobs: int = 0) -> np.ndarray:
     """
-    Custom JSON encoder to handle special types like numpy and pandas objects.
+    Single-pass equivalent of pd.Series.ewm(span, min_periods, adjust=False).mean().
+    Implements y[i] = alpha * x[i] + (1 - alpha) * y[i-1], carrying the last value over NaNs.
+    `seed`/`seed_nobs` continue the recurrence from a previously computed value.
     """
-    def default(self, obj):
-        if isinstance(obj, (datetime, date, pd.Timestamp)):
-            return obj.isoformat()
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, np.bool_):
-            return bool(obj)
-        return super(CustomJSONEncoder, self).default(obj)
+    n = values.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    alpha = 2.0 / (span + 1.0)
+    old_wt_factor = 1.0 - alpha
+    weighted = seed
+    nobs = seed_nobs
+    old_wt = 1.0
+    for i in range(n):
+        x = values[i]
+        is_observation = not np.isnan(x)
+        if is_observation:
+            nobs += 1
+        if not np.isnan(weighted):
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != x:
+                    weighted = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_observation:
+            weighted = x
+        out[i] = weighted if nobs >= min_periods else np.nan
+    return out
+
+
+@functools.lru_cache(maxsize=4)
+def _read_symbol_csv(csv_path: str, mtime_ns: int) -> frozenset:
+    """Parses a one-column symbol CSV. Memoized per file version (path + mtime)."""
+    # 1列のみのファイルなので pandas のパーサーは使わず、バイト列を一度デコードして空白で分割する
+    # （BOM を除去し、"NA" のようなティッカーが欠損値扱いされることも避けられる）
+    with open(csv_path, 'rb') as f:
+        return frozenset(f.read().decode('utf-8-sig').split())
+
+
+# Max number of symbols whose loaded frames are kept in memory per HWBDataManager
+FRAME_CACHE_SIZE = 256
+
+# Max idle read-only connections kept open per HWBDataManager
+READ_POOL_SIZE = 8
+
+# SQLite page cache per connection, in KiB. Only the single writer gets the large cache;
+# pooled readers live as long as the process, so each keeps a small one.
+WRITER_CACHE_SIZE_KIB = 131072  # 128 MiB
+READER_CACHE_SIZE_KIB = 8192  # 8 MiB
+
+# Queued analysis results: max backlog, and max rows committed per writer transaction
+ANALYSIS_WRITE_QUEUE_SIZE = 256
+ANALYSIS_WRITE_BATCH = 64
+
+# Max symbols per `WHERE symbol IN (...)` metadata query
+METADATA_QUERY_CHUNK = 900
+
+# Prices and moving averages are stored as INTEGER fixed-point values (value * PRICE_SCALE).
+# SQLite packs small integers into 1-6 bytes instead of 8 for a REAL.
+PRICE_SCALE = 10000
+
+DAILY_PRICES_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    symbol TEXT NOT NULL,
+    date DATE NOT NULL,
+    open INTEGER NOT NULL, high INTEGER NOT NULL, low INTEGER NOT NULL, close INTEGER NOT NULL, volume INTEGER NOT NULL,
+    sma200 INTEGER, ema200 INTEGER,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+"""
+
+WEEKLY_PRICES_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    symbol TEXT NOT NULL,
+    week_start_date DATE NOT NULL,
+    open INTEGER NOT NULL, high INTEGER NOT NULL, low INTEGER NOT NULL, close INTEGER NOT NULL, volume INTEGER NOT NULL,
+    sma200 INTEGER,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (symbol, week_start_date)
+) WITHOUT ROWID;
+"""
+
+
+# Statements executed for every symbol. Kept as constants so the exact same text
+# hits sqlite3's prepared-statement cache on each call.
+SQL_STATEMENT_CACHE_SIZE = 256
+
+UPSERT_DAILY_SQL = (
+    "INSERT INTO daily_prices (symbol, date, open, high, low, close, volume, sma200, ema200) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(symbol, date) DO UPDATE SET "
+    "open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, "
+    "volume=excluded.volume, sma200=excluded.sma200, ema200=excluded.ema200, "
+    "last_updated=CURRENT_TIMESTAMP"
+)
+
+UPSERT_WEEKLY_SQL = (
+    "INSERT INTO weekly_prices (symbol, week_start_date, open, high, low, close, volume, sma200) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(symbol, week_start_date) DO UPDATE SET "
+    "open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close, "
+    "volume=excluded.volume, sma200=excluded.sma200, "
+    "last_updated=CURRENT_TIMESTAMP"
+)
+
+DAILY_STATS_SQL = "SELECT COUNT(*), MIN(date), MAX(date) FROM daily_prices WHERE symbol = ?"
+WEEKLY_COUNT_SQL = "SELECT COUNT(*) FROM weekly_prices WHERE symbol = ?"
+
+UPSERT_METADATA_SQL = (
+    "INSERT OR REPLACE INTO data_metadata (symbol, first_date, last_date, last_updated, daily_count, weekly_count) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+UPSERT_ANALYSIS_SQL = "INSERT OR REPLACE INTO symbol_analysis (symbol, scan_date, payload) VALUES (?, ?, ?)"
+
+# {columns} is filled from a fixed column tuple, so each projection keeps one statement text
+LOAD_DAILY_SQL = "SELECT date, {columns} FROM daily_prices WHERE symbol = ? ORDER BY date DESC LIMIT ?"
+LOAD_WEEKLY_SQL = "SELECT week_start_date, {columns} FROM weekly_prices WHERE symbol = ? ORDER BY week_start_date DESC LIMIT ?"
+
+DAILY_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'sma200', 'ema200')
+WEEKLY_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'sma200')
+# Extending the moving averages only needs the stored closes and the last ema200
+DAILY_SEED_COLUMNS = ('close', 'ema200')
+WEEKLY_SEED_COLUMNS = ('close',)
+
 
 class HWBDataManager:
     """
     Manages all data operations for the HWB scanner, including:
     - SQLite database for historical price data (hwb_cache.db)
-    - Individual symbol JSON files for analysis results
+    - symbol_analysis table (in the same DB) for per-symbol analysis results
     - Daily summary JSON files
     """
     def __init__(self, base_data_path='data/hwb'):
@@ -48,10 +214,94 @@ class HWBDataManager:
         self.symbols_dir.mkdir(exist_ok=True)
         self.daily_dir.mkdir(exist_ok=True)
         self.session = requests.Session(impersonate="safari15_5")
+        # Serializes writes on the shared writer connection
         self.db_lock = threading.Lock()
+        # yf.download keeps its results in module-global state, so calls must not overlap
+        self.download_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Idle read-only connections; WAL lets them read while the writer commits
+        self._read_pool: queue.Queue = queue.Queue(maxsize=READ_POOL_SIZE)
+        # LRU of (symbol, lookback_years) -> (load date, daily_df, weekly_df)
+        self._frame_cache: OrderedDict = OrderedDict()
+        self._frame_cache_lock = threading.Lock()
+        # (symbol, scan_date, payload) rows waiting for the background analysis writer
+        self._analysis_queue: queue.Queue = queue.Queue(maxsize=ANALYSIS_WRITE_QUEUE_SIZE)
+        self._analysis_writer: Optional[threading.Thread] = None
+        self._analysis_writer_lock = threading.Lock()
         logger.info(f"HWBDataManager initialized. DB path: {self.db_path}")
         self._init_database()
 
+    def _get_conn(self) -> sqlite3.Connection:
+        """
+        Returns the long-lived connection to the cache DB, opening it on first use.
+        The connection is shared across worker threads, so callers must hold db_lock.
+        Use it as a context manager (`with self._get_conn() as conn:`) to commit or
+        roll back a unit of work; that does not close the connection.
+        """
+        if self._conn is None:
+            self._conn = self._open_connection(WRITER_CACHE_SIZE_KIB)
+        return self._conn
+
+    def _open_connection(self, cache_size_kib: int = READER_CACHE_SIZE_KIB) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                               cached_statements=SQL_STATEMENT_CACHE_SIZE)
+        self._configure_connection(conn, cache_size_kib)
+        return conn
+
+    @contextmanager
+    def _checkout(self) -> Iterator[sqlite3.Connection]:
+        """
+        Lends a pooled connection for reads that don't need db_lock.
+        Connections stay open between checkouts so their page cache and prepared
+        statements are reused; at most READ_POOL_SIZE idle ones are kept.
+        """
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_connection()
+        try:
+            yield conn
+        finally:
+            try:
+                self._read_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Closes the writer connection and all idle pooled connections."""
+        self.flush_symbol_data()
+        with self.db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    @staticmethod
+    def _configure_connection(conn: sqlite3.Connection, cache_size_kib: int):
+        """
+        Applies PRAGMAs for write-heavy scans.
+        page_size only applies when the database file is created.
+        journal_mode=WAL is persisted in the database file, so it is only switched when
+        not already active; the other settings are per-connection.
+        The memory map is backed by the OS page cache, which all connections share, so
+        only cache_size (private heap per connection) differs between writer and readers.
+        The busy timeout comes from sqlite3.connect(timeout=30).
+        """
+        cursor = conn.cursor()
+        # Only takes effect on a new, empty database file (must precede the switch to WAL)
+        cursor.execute("PRAGMA page_size=8192;")
+        journal_mode = cursor.execute("PRAGMA journal_mode;").fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            cursor.execute("PRAGMA journal_mode=WAL;")
+        cursor.execute("PRAGMA synchronous=NORMAL;")
+        cursor.execute("PRAGMA temp_store=MEMORY;")
+        cursor.execute(f"PRAGMA cache_size=-{int(cache_size_kib)};")
+        cursor.execute("PRAGMA mmap_size=268435456;")  # 256 MiB
+
     def _init_database(self):
         """
         Initializes the database and creates tables if they don't exist.
@@ -60,30 +310,14 @@ class HWBDataManager:
         logger.info("Initializing database schema...")
         try:
             with self.db_lock:
-                with sqlite3.connect(self.db_path, timeout=30) as conn:
+                with self._get_conn() as conn:
                     cursor = conn.cursor()
-                    # Daily prices table
-                    cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS daily_prices (
-                        symbol TEXT NOT NULL,
-                        date DATE NOT NULL,
-                        open REAL NOT NULL, high REAL NOT NULL, low REAL NOT NULL, close REAL NOT NULL, volume INTEGER NOT NULL,
-                        sma200 REAL, ema200 REAL,
-                        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        PRIMARY KEY (symbol, date)
-                    );
-                    """)
-                    # Weekly prices table
-                    cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS weekly_prices (
-                        symbol TEXT NOT NULL,
-                        week_start_date DATE NOT NULL,
-                        open REAL NOT NULL, high REAL NOT NULL, low REAL NOT NULL, close REAL NOT NULL, volume INTEGER NOT NULL,
-                        sma200 REAL,
-                        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        PRIMARY KEY (symbol, week_start_date)
-                    );
-                    """)
+                    # Price tables (prices stored as fixed-point INTEGER, see PRICE_SCALE).
+                    # WITHOUT ROWID clusters rows by (symbol, date), so a per-symbol range read is
+                    # served from the primary-key B-tree alone, like a covering index.
+                    cursor.execute(DAILY_PRICES_DDL.format(table='daily_prices'))
+                    cursor.execute(WEEKLY_PRICES_DDL.format(table='weekly_prices'))
+                    self._migrate_price_tables(cursor)
                     # Data metadata table
                     cursor.execute("""
                     CREATE TABLE IF NOT EXISTS data_metadata (
@@ -93,8 +327,18 @@ class HWBDataManager:
                     );
                     """)
                     # Indexes
-                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_symbol_date ON daily_prices(symbol, date DESC);")
-                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weekly_symbol_date ON weekly_prices(symbol, week_start_date DESC);")
+                    # The (symbol, date) primary keys already serve `WHERE symbol = ? ORDER BY date DESC`
+                    # by scanning backwards; separate DESC indexes only doubled the write cost.
+                    cursor.execute("DROP INDEX IF EXISTS idx_daily_symbol_date;")
+                    cursor.execute("DROP INDEX IF EXISTS idx_weekly_symbol_date;")
+                    # Per-symbol analysis results (orjson-encoded payloads)
+                    cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS symbol_analysis (
+                        symbol TEXT PRIMARY KEY,
+                        scan_date DATE NOT NULL,
+                        payload BLOB NOT NULL
+                    );
+                    """)
                     cursor.execute("CREATE INDEX IF NOT EXISTS idx_metadata_last_date ON data_metadata(last_date);")
                     conn.commit()
                     logger.info("Database schema initialized successfully.")
@@ -102,6 +346,54 @@ class HWBDataManager:
             logger.error(f"Database initialization failed: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def _price_table_layout(cursor: sqlite3.Cursor, table: str) -> Tuple[bool, bool]:
+        """Returns (needs_scaling, needs_rebuild) for a price table's current layout."""
+        col_types = {row[1]: row[2].upper() for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+        table_sql = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        needs_scaling = col_types.get('close') == 'REAL'
+        return needs_scaling, needs_scaling or 'WITHOUT ROWID' not in table_sql.upper()
+
+    @classmethod
+    def _migrate_price_tables(cls, cursor: sqlite3.Cursor):
+        """
+        One-time migration of price tables created with an older layout: REAL columns
+        are converted to fixed-point INTEGER (scaled by PRICE_SCALE), and rowid tables
+        are rebuilt as WITHOUT ROWID tables.
+        The cron CLI and the API server open the same DB, so the layout is re-read under
+        BEGIN IMMEDIATE before converting; otherwise a second process could scale prices twice.
+        """
+        for table, ddl, date_col, ma_cols in (
+            ('daily_prices', DAILY_PRICES_DDL, 'date', ['sma200', 'ema200']),
+            ('weekly_prices', WEEKLY_PRICES_DDL, 'week_start_date', ['sma200']),
+        ):
+            # Cheap check without the write lock; the common case is already migrated
+            if not cls._price_table_layout(cursor, table)[1]:
+                continue
+            cursor.execute("BEGIN IMMEDIATE;")
+            try:
+                needs_scaling, needs_rebuild = cls._price_table_layout(cursor, table)
+                if not needs_rebuild:
+                    cursor.execute("COMMIT;")
+                    continue
+                logger.info(f"Migrating '{table}' to the fixed-point INTEGER, WITHOUT ROWID layout...")
+                price_cols = ['open', 'high', 'low', 'close'] + ma_cols
+                if needs_scaling:
+                    scaled = ', '.join(f"CAST(ROUND({col} * {PRICE_SCALE}) AS INTEGER)" for col in price_cols)
+                else:
+                    scaled = ', '.join(price_cols)
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                cursor.execute(ddl.format(table=table))
+                cursor.execute(f"""
+                INSERT INTO {table} (symbol, {date_col}, {', '.join(price_cols)}, volume, last_updated)
+                SELECT symbol, substr({date_col}, 1, 10), {scaled}, volume, last_updated FROM {table}_legacy
+                """)
+                cursor.execute(f"DROP TABLE {table}_legacy")
+                cursor.execute("COMMIT;")
+            except sqlite3.Error:
+                cursor.execute("ROLLBACK;")
+                raise
+
     def get_stock_data_with_cache(self, symbol: str, lookback_years: int = 10) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
         """
         Retrieves historical stock data for a symbol, utilizing a local SQLite cache
@@ -109,209 +401,406 @@ class HWBDataManager:
         performs incremental updates on subsequent runs.
         Returns a tuple of (daily_df, weekly_df), or None if data cannot be retrieved.
         """
+        return self.get_stock_data_with_cache_bulk([symbol], lookback_years).get(symbol)
+
+    def get_stock_data_with_cache_bulk(self, symbols: List[str], lookback_years: int = 10,
+                                       weekly_filter: Optional[Callable[[pd.DataFrame], bool]] = None) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Batch version of get_stock_data_with_cache.
+        Symbols are grouped by the start date they need from yfinance so that each group
+        is fetched with a single yf.download call instead of one request per symbol.
+        If weekly_filter is given, the weekly frame is loaded first and symbols it rejects
+        are omitted without loading their (much larger) daily history.
+        Returns a dict of symbol -> (daily_df, weekly_df); symbols without data are omitted.
+        """
+        results = {}
+        if not symbols:
+            return results
         try:
-            # --- Step 1: Check metadata (inside a lock) ---
-            needs_update = False
-            start_date = None
-            with self.db_lock:
-                with sqlite3.connect(self.db_path, timeout=30) as conn:
-                    metadata = self._get_metadata(symbol, conn)
-                    today = datetime.now().date()
-                    if not metadata:
-                        logger.info(f"'{symbol}': First time fetch. Getting full history.")
-                        needs_update = True
-                        start_date = today - timedelta(days=365 * lookback_years)
-                    elif metadata['last_date'] < today:
-                        logger.info(f"'{symbol}': Cache is outdated (last: {metadata['last_date']}). Fetching delta.")
-                        needs_update = True
-                        start_date = metadata['last_date'] + timedelta(days=1)
+            today = datetime.now().date()
+
+            # --- Step 0: Serve symbols already loaded today from the in-process cache ---
+            pending = []
+            with self._frame_cache_lock:
+                for symbol in symbols:
+                    cached = self._frame_cache.get((symbol, lookback_years))
+                    if cached is not None and cached[0] == today:
+                        self._frame_cache.move_to_end((symbol, lookback_years))
+                        # Shallow copies so callers can reassign index/columns freely
+                        results[symbol] = (cached[1].copy(deep=False), cached[2].copy(deep=False))
                     else:
-                        logger.info(f"'{symbol}': Cache is up-to-date.")
-
-            # --- Step 2: Fetch new data if needed (outside the lock) ---
-            if needs_update:
-                df_new_daily, df_new_weekly = self._fetch_from_yfinance(symbol, start_date, datetime.now().date())
-
-                # --- Step 3: Save new data (inside a lock) ---
-                if (df_new_daily is not None and not df_new_daily.empty) or \
-                   (df_new_weekly is not None and not df_new_weekly.empty):
-                    with self.db_lock:
-                        with sqlite3.connect(self.db_path, timeout=30) as conn:
-                            df_old_daily = self._load_daily_from_db(symbol, conn, lookback_days=365*lookback_years)
-                            df_old_weekly = self._load_weekly_from_db(symbol, conn, lookback_weeks=52*lookback_years)
-
-                            df_full_daily = self._calculate_full_daily_ma(df_old_daily, df_new_daily)
-                            df_full_weekly = self._calculate_full_weekly_ma(df_old_weekly, df_new_weekly)
-
-                            self._save_to_db(symbol, conn, df_full_daily, df_full_weekly)
-                            self._update_metadata(symbol, conn)
+                        pending.append(symbol)
+            if not pending:
+                return results
+
+            # --- Step 1: Check metadata for all symbols at once ---
+            with self._checkout() as conn:
+                metadata_map = self._get_metadata_many(pending, conn)
+
+            start_date_buckets: Dict[date, List[str]] = {}
+            # Symbols whose DB rows are current for today; only these may be cached for the day,
+            # so a failed or rate-limited fetch is retried on the next call
+            fresh: Set[str] = set()
+            for symbol in pending:
+                metadata = metadata_map.get(symbol)
+                if not metadata or not metadata['last_date']:
+                    logger.info(f"'{symbol}': First time fetch. Getting full history.")
+                    start_date = today - timedelta(days=365 * lookback_years)
+                elif metadata['last_date'] + timedelta(days=1) < today:
+                    logger.info(f"'{symbol}': Cache is outdated (last: {metadata['last_date']}). Fetching delta.")
+                    start_date = metadata['last_date'] + timedelta(days=1)
                 else:
-                    logger.info(f"'{symbol}': No new data returned from yfinance.")
-
-            # --- Step 4: Load final data from DB (inside a lock) ---
-            with self.db_lock:
-                 with sqlite3.connect(self.db_path, timeout=30) as conn:
-                    final_df_daily = self._load_daily_from_db(symbol, conn, lookback_days=365 * lookback_years)
+                    # yfinance's end date is exclusive, so there is nothing newer to fetch yet
+                    logger.info(f"'{symbol}': Cache is up-to-date.")
+                    fresh.add(symbol)
+                    continue
+                start_date_buckets.setdefault(start_date, []).append(symbol)
+
+            # --- Step 2: Fetch new data per start-date bucket (outside the lock) ---
+            for start_date, bucket in start_date_buckets.items():
+                fetched = self._fetch_many_from_yfinance(bucket, start_date, today)
+
+                # --- Step 3: Compute MAs on a pooled reader, save on the writer (inside a lock) ---
+                for symbol in bucket:
+                    df_new_daily, df_new_weekly = fetched.get(symbol, (None, None))
+                    if (df_new_daily is None or df_new_daily.empty) and \
+                       (df_new_weekly is None or df_new_weekly.empty):
+                        logger.info(f"'{symbol}': No new data returned from yfinance.")
+                        continue
+                    try:
+                        with self._checkout() as conn:
+                            # Only one MA window of history is needed to extend the averages
+                            df_old_daily = self._load_daily_from_db(symbol, conn, lookback_days=MA_WINDOW,
+                                                                    columns=DAILY_SEED_COLUMNS)
+                            df_old_weekly = self._load_weekly_from_db(symbol, conn, lookback_weeks=MA_WINDOW,
+                                                                      columns=WEEKLY_SEED_COLUMNS)
+
+                        df_delta_daily = self._calculate_full_daily_ma(df_old_daily, df_new_daily)
+                        df_delta_weekly = self._calculate_full_weekly_ma(df_old_weekly, df_new_weekly)
+
+                        with self.db_lock:
+                            with self._get_conn() as conn:
+                                self._save_to_db(symbol, conn, df_delta_daily, df_delta_weekly)
+                                self._update_metadata(symbol, conn)
+                            self._invalidate_frame_cache(symbol)
+                        fresh.add(symbol)
+                    except Exception as e:
+                        logger.error(f"Error updating cache for '{symbol}': {e}", exc_info=True)
+
+            # --- Step 4: Load final data from DB ---
+            with self._checkout() as conn:
+                for symbol in pending:
                     final_df_weekly = self._load_weekly_from_db(symbol, conn, lookback_weeks=52 * lookback_years)
-
-            if final_df_daily.empty:
-                logger.warning(f"'{symbol}': No data available after fetch/load process.")
-                return None
-
-            return final_df_daily, final_df_weekly
+                    if weekly_filter is not None and not weekly_filter(final_df_weekly):
+                        continue
+                    final_df_daily = self._load_daily_from_db(symbol, conn, lookback_days=365 * lookback_years)
+                    if final_df_daily.empty:
+                        logger.warning(f"'{symbol}': No data available after fetch/load process.")
+                        continue
+                    if symbol in fresh:
+                        with self._frame_cache_lock:
+                            self._frame_cache[(symbol, lookback_years)] = (today, final_df_daily, final_df_weekly)
+                            self._frame_cache.move_to_end((symbol, lookback_years))
+                            if len(self._frame_cache) > FRAME_CACHE_SIZE:
+                                self._frame_cache.popitem(last=False)
+                    results[symbol] = (final_df_daily.copy(deep=False), final_df_weekly.copy(deep=False))
+
+            return results
         except Exception as e:
-            logger.error(f"Error in get_stock_data_with_cache for '{symbol}': {e}", exc_info=True)
-            return None
+            logger.error(f"Error in get_stock_data_with_cache_bulk for {len(symbols)} symbols: {e}", exc_info=True)
+            return results
+
+    def _invalidate_frame_cache(self, symbol: str):
+        """Drops cached frames of a symbol after its DB rows changed."""
+        with self._frame_cache_lock:
+            for key in [k for k in self._frame_cache if k[0] == symbol]:
+                del self._frame_cache[key]
 
-    def _get_metadata(self, symbol: str, conn) -> Optional[Dict]:
-        query = "SELECT symbol, first_date, last_date, last_updated, daily_count, weekly_count FROM data_metadata WHERE symbol = ?"
+    def iter_stock_data_batches(self, symbols: List[str], batch_size: int, lookback_years: int = 10,
+                                weekly_filter: Optional[Callable[[pd.DataFrame], bool]] = None) -> Iterator[Tuple[List[str], Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]]]:
+        """
+        Yields (batch, data) for consecutive batches of `symbols`, where data is the
+        result of get_stock_data_with_cache_bulk. The next batch is downloaded on a
+        background thread while the caller processes the current one.
+        """
+        batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+        if not batches:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(self.get_stock_data_with_cache_bulk, batches[0], lookback_years, weekly_filter)
+            for i, batch in enumerate(batches):
+                batch_data = future.result()
+                if i + 1 < len(batches):
+                    future = prefetcher.submit(self.get_stock_data_with_cache_bulk, batches[i + 1], lookback_years,
+                                               weekly_filter)
+                yield batch, batch_data
+
+    def _get_metadata_many(self, symbols: List[str], conn) -> Dict[str, Dict]:
+        """Fetches metadata rows for several symbols with a single query."""
+        if not symbols:
+            return {}
         try:
             cursor = conn.cursor()
-            row = cursor.execute(query, (symbol,)).fetchone()
-            if row:
-                row_dict = dict(zip([d[0] for d in cursor.description], row))
-                row_dict['first_date'] = datetime.strptime(row_dict['first_date'], '%Y-%m-%d').date() if row_dict['first_date'] else None
-                row_dict['last_date'] = datetime.strptime(row_dict['last_date'], '%Y-%m-%d').date() if row_dict['last_date'] else None
-                return row_dict
-            return None
+            rows = []
+            # Stay below SQLite's default limit of 999 bound parameters per statement
+            for i in range(0, len(symbols), METADATA_QUERY_CHUNK):
+                chunk = symbols[i:i + METADATA_QUERY_CHUNK]
+                placeholders = ', '.join('?' for _ in chunk)
+                query = f"SELECT symbol, first_date, last_date, last_updated, daily_count, weekly_count FROM data_metadata WHERE symbol IN ({placeholders})"
+                rows.extend(cursor.execute(query, tuple(chunk)).fetchall())
+            columns = ['symbol', 'first_date', 'last_date', 'last_updated', 'daily_count', 'weekly_count']
+            metadata_map = {}
+            for row in rows:
+                row_dict = dict(zip(columns, row))
+                # Rows written by pandas.to_sql carry a ' 00:00:00' suffix.
+                # date.fromisoformat is a C fast path, unlike strptime's regex-based parser.
+                row_dict['first_date'] = date.fromisoformat(row_dict['first_date'][:10]) if row_dict['first_date'] else None
+                row_dict['last_date'] = date.fromisoformat(row_dict['last_date'][:10]) if row_dict['last_date'] else None
+                metadata_map[row_dict['symbol']] = row_dict
+            return metadata_map
         except Exception as e:
-            logger.error(f"Failed to get metadata for {symbol}: {e}", exc_info=True)
-            return None
+            logger.error(f"Failed to get metadata for {len(symbols)} symbols: {e}", exc_info=True)
+            return {}
 
-    def _fetch_from_yfinance(self, symbol: str, start_date, end_date) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
-        logger.info(f"Fetching yfinance data for '{symbol}' from {start_date} to {end_date}")
+    def _fetch_many_from_yfinance(self, symbols: List[str], start_date, end_date) -> Dict[str, Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]]:
+        """
+        Downloads daily and weekly history for a group of symbols sharing the same start date.
+        Uses yf.download's threaded fetcher and slices per-symbol frames out of the
+        ticker-grouped MultiIndex columns.
+        """
+        logger.info(f"Fetching yfinance data for {len(symbols)} symbols from {start_date} to {end_date}")
         try:
-            ticker = yf.Ticker(symbol, session=self.session)
-
-            df_daily = ticker.history(start=start_date, end=end_date, interval="1d", auto_adjust=False)
-            df_daily = df_daily[~df_daily.index.duplicated(keep='first')]
-
             week_start = start_date - timedelta(days=start_date.weekday())
-            df_weekly = ticker.history(start=week_start, end=end_date, interval="1wk", auto_adjust=False)
-            df_weekly = df_weekly[~df_weekly.index.duplicated(keep='first')]
-
-            for df in [df_daily, df_weekly]:
-                if df is not None and not df.empty:
-                    # Make timezone naive to ensure consistency with data from DB
-                    if df.index.tz is not None:
-                        df.index = df.index.tz_localize(None)
-                    df.rename(columns=str.lower, inplace=True)
-                    df.dropna(subset=['open', 'high', 'low', 'close'], how='all', inplace=True)
-
-            logger.info(f"'{symbol}': Fetched {len(df_daily)} new daily and {len(df_weekly)} new weekly records.")
-            return df_daily, df_weekly
-
+            with self.download_lock:
+                raw_daily = yf.download(symbols, start=start_date, end=end_date, interval="1d", group_by='ticker',
+                                        threads=True, auto_adjust=False, session=self.session, progress=False)
+                raw_weekly = yf.download(symbols, start=week_start, end=end_date, interval="1wk", group_by='ticker',
+                                         threads=True, auto_adjust=False, session=self.session, progress=False)
         except Exception as e:
-            logger.error(f"yfinance fetch error for '{symbol}': {e}", exc_info=True)
-            return None, None
+            logger.error(f"yfinance batch fetch error for {len(symbols)} symbols: {e}", exc_info=True)
+            return {}
+
+        results = {}
+        for symbol in symbols:
+            try:
+                df_daily = self._extract_symbol_frame(raw_daily, symbol)
+                df_weekly = self._extract_symbol_frame(raw_weekly, symbol)
+                logger.info(f"'{symbol}': Fetched {len(df_daily)} new daily and {len(df_weekly)} new weekly records.")
+                results[symbol] = (df_daily, df_weekly)
+            except Exception as e:
+                logger.error(f"yfinance fetch error for '{symbol}': {e}", exc_info=True)
+                results[symbol] = (None, None)
+        return results
+
+    @staticmethod
+    def _extract_symbol_frame(raw: Optional[pd.DataFrame], symbol: str) -> pd.DataFrame:
+        """Slices one symbol's OHLCV frame out of a yf.download result."""
+        if raw is None or raw.empty:
+            return pd.DataFrame()
+        if isinstance(raw.columns, pd.MultiIndex):
+            if symbol not in raw.columns.get_level_values(0):
+                return pd.DataFrame()
+            df = raw.xs(symbol, axis=1, level=0)
+        else:
+            # Shallow copy so renaming columns below does not touch the caller's frame
+            df = raw.copy(deep=False)
+        columns = df.columns.str.lower()
+
+        # Drop duplicate dates and all-NaN OHLC rows (symbols missing from a batch)
+        # with a single mask, so only one new frame is materialized
+        ohlc = df.iloc[:, columns.get_indexer(['open', 'high', 'low', 'close'])].to_numpy(dtype=np.float64)
+        keep = ~np.isnan(ohlc).all(axis=1)
+        # All symbols of a batch share one index object, whose is_unique is computed once and cached
+        if not df.index.is_unique:
+            keep &= ~df.index.duplicated(keep='first')
+        if not keep.all():
+            df = df.iloc[keep]
+        df.columns = columns
+
+        # Make timezone naive to ensure consistency with data from DB
+        if df.index.tz is not None:
+            df.index = df.index.tz_localize(None)
+        return df
+
+    @staticmethod
+    def _prepare_ma_delta(df_old: pd.DataFrame, df_new: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Returns (seed, delta): the old rows preceding the new data, limited to one
+        MA window, and the deduplicated new rows sorted by date.
+        New rows overwrite old rows of the same date (e.g. the current, still-forming week).
+        """
+        # yfinance output is normally already sorted and unique; only dedup/sort otherwise
+        if not (df_new.index.is_monotonic_increasing and df_new.index.is_unique):
+            df_new = df_new[~df_new.index.duplicated(keep='last')].sort_index()
+        if df_new['close'].isna().any():
+            df_new = df_new.dropna(subset=['close'])
+        if df_old is None or df_old.empty or df_new.empty:
+            return pd.DataFrame(), df_new
+        # df_old is sorted, so the seed is a positional slice ending before the first new date
+        end = df_old.index.searchsorted(df_new.index[0])
+        seed = df_old.iloc[max(0, end - (MA_WINDOW - 1)):end]
+        return seed, df_new
 
     def _calculate_full_daily_ma(self, df_old: pd.DataFrame, df_new: Optional[pd.DataFrame]) -> pd.DataFrame:
-        if df_new is None or df_new.empty: return df_old
-        df_full = pd.concat([df_old, df_new])
-        df_full = df_full[~df_full.index.duplicated(keep='last')].sort_index()
-        df_full['sma200'] = df_full['close'].rolling(window=200, min_periods=50).mean()
-        df_full['ema200'] = df_full['close'].ewm(span=200, min_periods=50, adjust=False).mean()
-        return df_full
+        """
+        Computes sma200/ema200 for the new daily rows only.
+        `df_old` only needs the last MA_WINDOW stored rows: the SMA is rolled over
+        seed + new closes and the EMA recurrence continues from the last stored value.
+        """
+        if df_new is None or df_new.empty: return pd.DataFrame()
+        seed, df_delta = self._prepare_ma_delta(df_old, df_new)
+        if df_delta.empty: return df_delta
+        # Shallow copy: the MA columns are new, so the fetched frame's OHLCV data is not duplicated
+        df_delta = df_delta.copy(deep=False)
+        n_new = len(df_delta)
+        new_close = df_delta['close'].to_numpy(dtype=np.float64)
+        seed_close = seed['close'].to_numpy(dtype=np.float64) if not seed.empty else np.empty(0)
+        close = np.concatenate([seed_close, new_close])
+
+        df_delta['sma200'] = _rolling_mean_nb(close, MA_WINDOW, MA_MIN_PERIODS)[-n_new:]
+
+        seed_ema = seed['ema200'].iloc[-1] if not seed.empty and 'ema200' in seed.columns else np.nan
+        if pd.isna(seed_ema):
+            # Fewer than MA_MIN_PERIODS stored rows: the seed is the whole history
+            df_delta['ema200'] = _ewm_mean_nb(close, MA_WINDOW, MA_MIN_PERIODS)[-n_new:]
+        else:
+            df_delta['ema200'] = _ewm_mean_nb(new_close, MA_WINDOW, MA_MIN_PERIODS, float(seed_ema), MA_MIN_PERIODS)
+        return df_delta
 
     def _calculate_full_weekly_ma(self, df_old: pd.DataFrame, df_new: Optional[pd.DataFrame]) -> pd.DataFrame:
-        if df_new is None or df_new.empty: return df_old
-        df_full = pd.concat([df_old, df_new])
-        df_full = df_full[~df_full.index.duplicated(keep='last')].sort_index()
-        df_full['sma200'] = df_full['close'].rolling(window=200, min_periods=50).mean()
-        return df_full
+        """Computes sma200 for the new weekly rows only (see _calculate_full_daily_ma)."""
+        if df_new is None or df_new.empty: return pd.DataFrame()
+        seed, df_delta = self._prepare_ma_delta(df_old, df_new)
+        if df_delta.empty: return df_delta
+        df_delta = df_delta.copy(deep=False)
+        seed_close = seed['close'].to_numpy(dtype=np.float64) if not seed.empty else np.empty(0)
+        close = np.concatenate([seed_close, df_delta['close'].to_numpy(dtype=np.float64)])
+        df_delta['sma200'] = _rolling_mean_nb(close, MA_WINDOW, MA_MIN_PERIODS)[-len(df_delta):]
+        return df_delta
 
     def _save_to_db(self, symbol: str, conn, df_daily: pd.DataFrame, df_weekly: pd.DataFrame):
         """
-        Atomically replaces all data for a given symbol in the database.
-        This prevents UNIQUE constraint errors from overlapping data fetches.
+        Atomically upserts the new/changed rows for a given symbol.
+        Rows of an existing date are updated in place (ON CONFLICT DO UPDATE), which
+        prevents UNIQUE constraint errors from overlapping data fetches.
         """
         cursor = conn.cursor()
         try:
             # Start a transaction
             cursor.execute("BEGIN;")
 
-            # Delete old entries for this symbol first
-            cursor.execute("DELETE FROM daily_prices WHERE symbol = ?", (symbol,))
-            cursor.execute("DELETE FROM weekly_prices WHERE symbol = ?", (symbol,))
-
             # Save the new, complete dataframes
             if df_daily is not None and not df_daily.empty:
                 # Final safeguard against invalid data before saving
-                df_daily = df_daily.dropna(subset=['open', 'high', 'low', 'close'], how='any')
-                df_daily = df_daily[df_daily.index.notna()]
+                df_daily = self._drop_invalid_rows(df_daily)
 
                 if not df_daily.empty:
-                    df_to_save = df_daily[['open', 'high', 'low', 'close', 'volume', 'sma200', 'ema200']].copy()
-                    df_to_save['symbol'] = symbol
-                    df_to_save.index.name = 'date'
-                    df_to_save.reset_index(inplace=True)
-                    df_to_save.to_sql('daily_prices', conn, if_exists='append', index=False)
+                    rows = self._build_rows(symbol, df_daily, ['open', 'high', 'low', 'close', 'volume', 'sma200', 'ema200'])
+                    cursor.executemany(UPSERT_DAILY_SQL, rows)
 
             if df_weekly is not None and not df_weekly.empty:
                 # Final safeguard against invalid data before saving
-                df_weekly = df_weekly.dropna(subset=['open', 'high', 'low', 'close'], how='any')
-                df_weekly = df_weekly[df_weekly.index.notna()]
+                df_weekly = self._drop_invalid_rows(df_weekly)
 
                 if not df_weekly.empty:
-                    df_to_save = df_weekly[['open', 'high', 'low', 'close', 'volume', 'sma200']].copy()
-                    df_to_save['symbol'] = symbol
-                    df_to_save.index.name = 'week_start_date'
-                    df_to_save.reset_index(inplace=True)
-                    df_to_save.to_sql('weekly_prices', conn, if_exists='append', index=False)
+                    rows = self._build_rows(symbol, df_weekly, ['open', 'high', 'low', 'close', 'volume', 'sma200'])
+                    cursor.executemany(UPSERT_WEEKLY_SQL, rows)
 
             # Commit the transaction
             conn.commit()
-            logger.info(f"Successfully replaced data for '{symbol}' in DB.")
+            logger.info(f"Successfully saved new data for '{symbol}' in DB.")
 
         except Exception as e:
             logger.error(f"Failed to save data for '{symbol}', rolling back transaction. Error: {e}", exc_info=True)
             conn.rollback()
             raise
 
+    @staticmethod
+    def _drop_invalid_rows(df: pd.DataFrame) -> pd.DataFrame:
+        """Removes rows with a missing OHLC value or date using one mask; returns df itself if all rows are valid."""
+        valid = ~np.isnan(df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)).any(axis=1) & df.index.notna()
+        return df if valid.all() else df[valid]
+
+    @staticmethod
+    def _build_rows(symbol: str, df: pd.DataFrame, columns: List[str]) -> List[tuple]:
+        """
+        Converts a price DataFrame into parameter tuples for executemany.
+        Dates are stored as 'YYYY-MM-DD'; prices are scaled to fixed-point integers
+        (PRICE_SCALE) and NaN becomes NULL.
+        """
+        dates = pd.DatetimeIndex(df.index).strftime('%Y-%m-%d').tolist()
+        values = []
+        for col in columns:
+            if col == 'volume':
+                values.append(df[col].fillna(0).astype('int64').tolist())
+                continue
+            arr = df[col].to_numpy(dtype=np.float64)
+            nan_mask = np.isnan(arr)
+            scaled = np.round(np.where(nan_mask, 0.0, arr) * PRICE_SCALE).astype(np.int64).tolist()
+            if nan_mask.any():
+                scaled = [None if is_nan else v for v, is_nan in zip(scaled, nan_mask.tolist())]
+            values.append(scaled)
+        return list(zip(itertools.repeat(symbol), dates, *values))
+
     def _update_metadata(self, symbol: str, conn):
         logger.info(f"Updating metadata for '{symbol}'...")
         try:
             cursor = conn.cursor()
-            daily_stats_q = "SELECT COUNT(*), MIN(date), MAX(date) FROM daily_prices WHERE symbol = ?"
-            weekly_stats_q = "SELECT COUNT(*), MIN(week_start_date), MAX(week_start_date) FROM weekly_prices WHERE symbol = ?"
-
-            daily_count, first_daily, last_daily = cursor.execute(daily_stats_q, (symbol,)).fetchone()
-            weekly_count, _, _ = cursor.execute(weekly_stats_q, (symbol,)).fetchone()
-
-            metadata_values = {
-                'symbol': symbol, 'first_date': first_daily, 'last_date': last_daily,
-                'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'daily_count': daily_count, 'weekly_count': weekly_count,
-            }
-
-            cols = ', '.join(metadata_values.keys())
-            placeholders = ', '.join('?' for _ in metadata_values)
-            sql = f"INSERT OR REPLACE INTO data_metadata ({cols}) VALUES ({placeholders})"
-            cursor.execute(sql, tuple(metadata_values.values()))
+            daily_count, first_daily, last_daily = cursor.execute(DAILY_STATS_SQL, (symbol,)).fetchone()
+            weekly_count = cursor.execute(WEEKLY_COUNT_SQL, (symbol,)).fetchone()[0]
+
+            cursor.execute(UPSERT_METADATA_SQL, (
+                symbol, first_daily, last_daily,
+                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                daily_count, weekly_count,
+            ))
             conn.commit()
             logger.info(f"Metadata for '{symbol}' updated successfully.")
         except Exception as e:
             logger.error(f"Failed to update metadata for '{symbol}': {e}", exc_info=True)
             raise
 
-    def _load_daily_from_db(self, symbol: str, conn, lookback_days: int) -> pd.DataFrame:
-        query = "SELECT date, open, high, low, close, volume, sma200, ema200 FROM daily_prices WHERE symbol = ? ORDER BY date DESC LIMIT ?"
+    def _load_daily_from_db(self, symbol: str, conn, lookback_days: int,
+                            columns: Tuple[str, ...] = DAILY_COLUMNS) -> pd.DataFrame:
         try:
-            df = pd.read_sql_query(query, conn, params=(symbol, lookback_days), index_col='date', parse_dates=['date'])
-            return df.sort_index() if not df.empty else pd.DataFrame()
+            query = LOAD_DAILY_SQL.format(columns=', '.join(columns))
+            rows = conn.execute(query, (symbol, lookback_days)).fetchall()
+            return self._rows_to_frame(rows, 'date', columns)
         except Exception as e:
             logger.error(f"Failed to load daily data for '{symbol}': {e}", exc_info=True)
             return pd.DataFrame()
 
-    def _load_weekly_from_db(self, symbol: str, conn, lookback_weeks: int) -> pd.DataFrame:
-        query = "SELECT week_start_date, open, high, low, close, volume, sma200 FROM weekly_prices WHERE symbol = ? ORDER BY week_start_date DESC LIMIT ?"
+    def _load_weekly_from_db(self, symbol: str, conn, lookback_weeks: int,
+                             columns: Tuple[str, ...] = WEEKLY_COLUMNS) -> pd.DataFrame:
         try:
-            df = pd.read_sql_query(query, conn, params=(symbol, lookback_weeks), index_col='week_start_date', parse_dates=['week_start_date'])
-            return df.sort_index() if not df.empty else pd.DataFrame()
+            query = LOAD_WEEKLY_SQL.format(columns=', '.join(columns))
+            rows = conn.execute(query, (symbol, lookback_weeks)).fetchall()
+            return self._rows_to_frame(rows, 'week_start_date', columns)
         except Exception as e:
             logger.error(f"Failed to load weekly data for '{symbol}': {e}", exc_info=True)
             return pd.DataFrame()
 
+    @staticmethod
+    def _rows_to_frame(rows: List[tuple], index_name: str, columns: Tuple[str, ...]) -> pd.DataFrame:
+        """
+        Builds a date-indexed DataFrame from rows fetched newest-first.
+        Columns are converted straight into NumPy arrays (NULL -> NaN) instead of
+        going through pandas.read_sql_query's per-call type inference, and
+        fixed-point prices are scaled back to floats.
+        """
+        if not rows:
+            return pd.DataFrame()
+        rows.reverse()
+        dates, *values = zip(*rows)
+        # Rows written by pandas.to_sql carry a ' 00:00:00' suffix
+        index = pd.to_datetime(pd.Index(dates).str.slice(0, 10), format='%Y-%m-%d')
+        index.name = index_name
+        data = {
+            col: np.array(vals, dtype=np.int64) if col == 'volume' else np.array(vals, dtype=np.float64) / PRICE_SCALE
+            for col, vals in zip(columns, values)
+        }
+        return pd.DataFrame(data, index=index)
+
     def get_russell3000_symbols(self) -> set:
         """
         Retrieves the list of Russell 3000 symbols from the local CSV file.
@@ -321,9 +810,8 @@ class HWBDataManager:
         csv_path = Path(__file__).parent / 'russell3000.csv'
         try:
             logger.info(f"Loading symbols from {csv_path}...")
-            df = pd.read_csv(csv_path, header=None)
-            # 1列目のデータを抽出し、不要な空白を削除
-            symbols = set(df.iloc[:, 0].str.strip())
+            # ファイルの更新時刻をキーにプロセス内でメモ化（再読み込み・再パースを避ける）
+            symbols = set(_read_symbol_csv(str(csv_path), csv_path.stat().st_mtime_ns))
             logger.info(f"Loaded {len(symbols)} symbols from the CSV file.")
             return symbols
         except FileNotFoundError:
@@ -333,25 +821,75 @@ class HWBDataManager:
             logger.error(f"Failed to read or parse Russell 3000 symbols from CSV: {e}", exc_info=True)
             return set()
 
-    def save_symbol_data(self, symbol: str, data: dict):
-        """Saves the analysis result for a single symbol to a JSON file."""
+    def enqueue_symbol_data(self, symbol: str, data: dict):
+        """
+        Saves the analysis result for a single symbol to the symbol_analysis table.
+        Only the encoding happens in the caller's thread; the write is done by a
+        background thread that commits queued results in batches, so call
+        flush_symbol_data() before reading them back.
+        """
         try:
-            filepath = self.symbols_dir / f"{symbol}.json"
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, cls=CustomJSONEncoder)
-            logger.info(f"Saved analysis for '{symbol}' to {filepath}")
+            payload = orjson.dumps(data, default=orjson_default, option=orjson.OPT_SERIALIZE_NUMPY)
         except Exception as e:
-            logger.error(f"Failed to save symbol data for '{symbol}': {e}", exc_info=True)
+            logger.error(f"Failed to encode symbol data for '{symbol}': {e}", exc_info=True)
+            return
+        with self._analysis_writer_lock:
+            if self._analysis_writer is None or not self._analysis_writer.is_alive():
+                self._analysis_writer = threading.Thread(
+                    target=self._analysis_writer_loop, name='hwb-analysis-writer', daemon=True
+                )
+                self._analysis_writer.start()
+        self._analysis_queue.put((symbol, datetime.now().strftime('%Y-%m-%d'), payload))
+
+    def flush_symbol_data(self):
+        """Blocks until every result passed to enqueue_symbol_data has been written."""
+        self._analysis_queue.join()
+
+    def _analysis_writer_loop(self):
+        while True:
+            rows = [self._analysis_queue.get()]
+            while len(rows) < ANALYSIS_WRITE_BATCH:
+                try:
+                    rows.append(self._analysis_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.db_lock:
+                    with self._get_conn() as conn:
+                        conn.executemany(UPSERT_ANALYSIS_SQL, rows)
+                logger.info(f"Saved analysis for {len(rows)} symbols to symbol_analysis")
+            except Exception as e:
+                logger.error(f"Failed to save analysis for {len(rows)} symbols: {e}", exc_info=True)
+            finally:
+                for _ in rows:
+                    self._analysis_queue.task_done()
 
     def load_symbol_data(self, symbol: str) -> Optional[dict]:
-        """Loads the analysis result for a single symbol from its JSON file."""
+        """
+        Loads the analysis result for a single symbol.
+        Falls back to the legacy per-symbol JSON file for results saved before the
+        symbol_analysis table existed.
+        """
+        try:
+            with self._checkout() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM symbol_analysis WHERE symbol = ?", (symbol,)
+                ).fetchone()
+            if row:
+                return orjson.loads(row[0])
+        except orjson.JSONDecodeError:
+            logger.warning(f"Could not decode stored analysis for '{symbol}'. Payload might be corrupt.")
+            return None
+        except Exception as e:
+            logger.error(f"Failed to load symbol data for '{symbol}': {e}", exc_info=True)
+            return None
+
         filepath = self.symbols_dir / f"{symbol}.json"
         if not filepath.exists() or os.path.getsize(filepath) == 0:
             return None
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
+            return orjson.loads(filepath.read_bytes())
+        except orjson.JSONDecodeError:
             logger.warning(f"Could not decode JSON for '{symbol}' from {filepath}. File might be corrupt or empty.")
             return None
         except Exception as e:
@@ -364,15 +902,16 @@ class HWBDataManager:
             scan_date = summary_data.get("scan_date", datetime.now().strftime('%Y-%m-%d'))
             # Save the date-specific summary
             date_filepath = self.daily_dir / f"{scan_date}.json"
-            with open(date_filepath, 'w', encoding='utf-8') as f:
-                json.dump(summary_data, f, indent=2, ensure_ascii=False, cls=CustomJSONEncoder)
+            date_filepath.write_bytes(orjson.dumps(
+                summary_data, default=orjson_default,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            ))
             logger.info(f"Saved daily summary to {date_filepath}")
 
             # Update the 'latest.json' file
             latest_filepath = self.daily_dir / "latest.json"
             # Use a simple copy for compatibility across systems instead of symlink
-            with open(latest_filepath, 'w', encoding='utf-8') as f:
-                json.dump(summary_data, f, indent=2, ensure_ascii=False, cls=CustomJSONEncoder)
+            shutil.copyfile(date_filepath, latest_filepath)
             logger.info(f"Updated latest summary at {latest_filepath}")
 
         except Exception as e:
@@ -1,12 +1,13 @@
 import json
 import os
-import asyncio
 import concurrent.futures
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 import pandas as pd
 import numpy as np
 import uuid
+import threading
+from numba import njit
 from dotenv import load_dotenv
 from .hwb_data_manager import HWBDataManager
 import logging
@@ -18,7 +19,7 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # --- Constants ---
-BATCH_SIZE = int(os.getenv('BATCH_SIZE', '50'))
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '200'))
 MAX_WORKERS = int(os.getenv('MAX_WORKERS', '10'))
 
 # Rule 1: Trend Filter
@@ -38,6 +39,47 @@ FVG_ZONE_PROXIMITY = float(os.getenv('FVG_ZONE_PROXIMITY', '0.10'))  # 10%
 BREAKOUT_THRESHOLD = float(os.getenv('BREAKOUT_THRESHOLD', '0.001'))  # 0.1%
 
 
+@njit(cache=True, nogil=True, error_model='numpy')
+def _scan_fvg_nb(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 sma: np.ndarray, ema: np.ndarray, start: int, end: int,
+                 min_gap: float, proximity: float, zone_proximity: float) -> np.ndarray:
+    """
+    [start, end) の範囲でFVG条件を満たす3本目のローソク足の位置を返す（bot_hwb.py方式）
+
+    条件:
+    1. candle_3のlow > candle_1のhigh かつ ギャップ率 >= min_gap
+    2. MA近接条件A: 3本目の始値or終値がMA±proximity以内
+       またはMA近接条件B: FVGゾーンの中心がMA±zone_proximity以内
+    閾値はキャッシュされたJITに固定されないよう引数で渡す
+    """
+    hits = np.empty(max(end - start, 0), dtype=np.int64)
+    n_hits = 0
+    for i in range(max(start, 2), end):
+        # FVG条件: candle_3のlowがcandle_1のhighより上
+        if low[i] <= high[i - 2]:
+            continue
+        # ギャップ率チェック
+        gap = (low[i] - high[i - 2]) / high[i - 2]
+        if gap < min_gap:
+            continue
+        if np.isnan(sma[i]) or np.isnan(ema[i]):
+            continue
+        # 条件A: 3本目の始値or終値がMA±5%以内
+        near = False
+        for price in (open_[i], close[i]):
+            if abs(price - sma[i]) / sma[i] <= proximity or abs(price - ema[i]) / ema[i] <= proximity:
+                near = True
+                break
+        if not near:
+            # 条件B: FVGゾーンの中心がMA±10%以内
+            center = (high[i - 2] + low[i]) / 2
+            near = abs(center - sma[i]) / sma[i] <= zone_proximity or abs(center - ema[i]) / ema[i] <= zone_proximity
+        if near:
+            hits[n_hits] = i
+            n_hits += 1
+    return hits[:n_hits]
+
+
 class HWBAnalyzer:
     """HWB分析エンジン（bot_hwb.py方式に統一）"""
     
@@ -122,92 +164,73 @@ class HWBAnalyzer:
             return setups
         
         # ATR計算（全期間）
-        atr = (df_daily['high'] - df_daily['low']).rolling(14).mean()
-        
-        for i in range(scan_start_index, len(df_daily)):
-            row = df_daily.iloc[i]
-            setup_date = df_daily.index[i]
-            
-            # この日付時点で週足200MAフィルターをチェック
-            if not self.check_weekly_trend_at_date(df_weekly, setup_date):
-                continue
-            
-            if pd.isna(row.get('sma200')) or pd.isna(row.get('ema200')):
-                continue
-
-            # MAゾーン計算
-            zone_width = abs(row['sma200'] - row['ema200'])
-            if atr.iloc[i] > 0:
-                zone_width = max(zone_width, row['close'] * (atr.iloc[i] / row['close']) * 0.5)
-
-            zone_upper = max(row['sma200'], row['ema200']) + zone_width * 0.2
-            zone_lower = min(row['sma200'], row['ema200']) - zone_width * 0.2
-
-            # セットアップ判定
-            if zone_lower <= row['open'] <= zone_upper and zone_lower <= row['close'] <= zone_upper:
-                setup = {
-                    'id': str(uuid.uuid4()),
-                    'date': setup_date,
-                    'type': 'PRIMARY',
-                    'status': 'active',
-                    'weekly_deviation': self._get_weekly_deviation_at_date(df_weekly, setup_date)
-                }
-                setups.append(setup)
-            elif (zone_lower <= row['open'] <= zone_upper) or (zone_lower <= row['close'] <= zone_upper):
-                body_center = (row['open'] + row['close']) / 2
-                if zone_lower <= body_center <= zone_upper:
-                    setup = {
-                        'id': str(uuid.uuid4()),
-                        'date': setup_date,
-                        'type': 'SECONDARY',
-                        'status': 'active',
-                        'weekly_deviation': self._get_weekly_deviation_at_date(df_weekly, setup_date)
-                    }
-                    setups.append(setup)
+        atr = (df_daily['high'] - df_daily['low']).rolling(14).mean().to_numpy()[scan_start_index:]
+
+        # スキャン範囲の列をNumPy配列として一括取得（行ごとのiloc呼び出しを避ける）
+        window = df_daily.iloc[scan_start_index:]
+        dates = window.index
+        open_ = window['open'].to_numpy(dtype=np.float64)
+        close = window['close'].to_numpy(dtype=np.float64)
+        sma = window['sma200'].to_numpy(dtype=np.float64)
+        ema = window['ema200'].to_numpy(dtype=np.float64)
+
+        # 各日付時点での週足200MA乖離率（週足フィルター兼記録用）
+        weekly_deviation = self._weekly_deviation_at_dates(df_weekly, dates)
+
+        # MAゾーン計算
+        with np.errstate(invalid='ignore', divide='ignore'):
+            zone_width = np.abs(sma - ema)
+            zone_width = np.where(atr > 0, np.maximum(zone_width, close * (atr / close) * 0.5), zone_width)
+            zone_upper = np.maximum(sma, ema) + zone_width * 0.2
+            zone_lower = np.minimum(sma, ema) - zone_width * 0.2
+
+            open_in_zone = (zone_lower <= open_) & (open_ <= zone_upper)
+            close_in_zone = (zone_lower <= close) & (close <= zone_upper)
+            body_center = (open_ + close) / 2
+            center_in_zone = (zone_lower <= body_center) & (body_center <= zone_upper)
+            # NaNとの比較はFalseになるため、週足フィルター・MA欠損のチェックも兼ねる
+            eligible = weekly_deviation >= WEEKLY_TREND_THRESHOLD
+
+        # セットアップ判定
+        primary = eligible & open_in_zone & close_in_zone
+        secondary = eligible & ~primary & (open_in_zone | close_in_zone) & center_in_zone
+
+        for i in np.flatnonzero(primary | secondary):
+            setup = {
+                'id': str(uuid.uuid4()),
+                'date': dates[i],
+                'type': 'PRIMARY' if primary[i] else 'SECONDARY',
+                'status': 'active',
+                'weekly_deviation': weekly_deviation[i]
+            }
+            setups.append(setup)
         
         logger.info(f"セットアップ検出完了：{len(setups)}件")
         return setups
 
-    def _get_weekly_deviation_at_date(self, df_weekly: pd.DataFrame, check_date: pd.Timestamp) -> Optional[float]:
-        """指定日時点での週足200MAからの乖離率を取得（記録用）"""
-        try:
-            df_weekly_historical = df_weekly[df_weekly.index <= check_date]
-            if df_weekly_historical.empty:
-                return None
-            
-            latest = df_weekly_historical.iloc[-1]
-            if pd.isna(latest['sma200']) or latest['sma200'] == 0:
-                return None
-            
-            return (latest['close'] - latest['sma200']) / latest['sma200']
-        except:
-            return None
-
-    def _check_fvg_ma_proximity(self, candle_3: pd.Series, candle_1: pd.Series) -> bool:
+    @staticmethod
+    def _weekly_deviation_at_dates(df_weekly: pd.DataFrame, dates: pd.DatetimeIndex) -> np.ndarray:
         """
-        FVGがMA近接条件を満たすかチェック（bot_hwb.py方式）
-        
-        条件A: 3本目の始値or終値がMA±5%以内
-        条件B: FVGゾーンの中心がMA±10%以内
+        各日付時点で最新の週足の200MA乖離率を一括計算
+        （check_weekly_trend_at_date と同じ判定、該当なしはNaN）
         """
-        if pd.isna(candle_3.get('sma200')) or pd.isna(candle_3.get('ema200')):
-            return False
-        
-        # 条件A: 3本目の始値or終値がMA±5%以内
-        for price in [candle_3['open'], candle_3['close']]:
-            sma_deviation = abs(price - candle_3['sma200']) / candle_3['sma200']
-            ema_deviation = abs(price - candle_3['ema200']) / candle_3['ema200']
-            if sma_deviation <= PROXIMITY_PERCENTAGE or ema_deviation <= PROXIMITY_PERCENTAGE:
-                return True
-        
-        # 条件B: FVGゾーンの中心がMA±10%以内
-        fvg_center = (candle_1['high'] + candle_3['low']) / 2
-        sma_deviation = abs(fvg_center - candle_3['sma200']) / candle_3['sma200']
-        ema_deviation = abs(fvg_center - candle_3['ema200']) / candle_3['ema200']
-        
-        return sma_deviation <= FVG_ZONE_PROXIMITY or ema_deviation <= FVG_ZONE_PROXIMITY
-
-    def optimized_fvg_detection(self, df_daily: pd.DataFrame, setup: Dict) -> List[Dict]:
+        deviation = np.full(len(dates), np.nan)
+        if df_weekly is None or df_weekly.empty or 'sma200' not in df_weekly.columns:
+            return deviation
+
+        weekly_close = df_weekly['close'].to_numpy(dtype=np.float64)
+        weekly_sma = df_weekly['sma200'].to_numpy(dtype=np.float64)
+        # 各日付以前で最後の週足の位置
+        pos = df_weekly.index.searchsorted(dates, side='right') - 1
+        has_week = pos >= 0
+        sma_at = weekly_sma[pos[has_week]]
+        close_at = weekly_close[pos[has_week]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deviation[has_week] = np.where(sma_at != 0, (close_at - sma_at) / sma_at, np.nan)
+        return deviation
+
+    def optimized_fvg_detection(self, df_daily: pd.DataFrame, setup: Dict,
+                                fvg_candidates: Optional[np.ndarray] = None) -> List[Dict]:
         """
         Rule ③: FVG検出（bot_hwb.py方式、スコアリング削除）
         
@@ -215,6 +238,8 @@ class HWBAnalyzer:
         1. candle_3のlow > candle_1のhigh (ギャップ存在)
         2. ギャップ率 > 0.1%
         3. MA近接条件を満たす
+
+        fvg_candidates: find_fvg_candidates の結果（複数セットアップで使い回す場合に指定）
         """
         fvgs = []
         setup_date = setup['date']
@@ -227,34 +252,53 @@ class HWBAnalyzer:
         max_days = self.params['fvg_search_days']
         search_end = min(setup_idx + max_days, len(df_daily) - 1)
 
-        for i in range(setup_idx + 2, search_end):
-            if i >= len(df_daily):
-                break
-                
-            candle_1 = df_daily.iloc[i-2]
-            candle_3 = df_daily.iloc[i]
-            
-            # FVG条件: candle_3のlowがcandle_1のhighより上
-            if candle_3['low'] <= candle_1['high']:
-                continue
+        return self.detect_fvgs_in_range(df_daily, setup, setup_idx + 2, search_end, fvg_candidates)
 
-            # ギャップ率チェック（0.1%以上）
-            gap_percentage = (candle_3['low'] - candle_1['high']) / candle_1['high']
-            if gap_percentage < FVG_MIN_GAP_PERCENTAGE:
-                continue
+    def find_fvg_candidates(self, df_daily: pd.DataFrame, start_idx: int = 0,
+                            end_idx: Optional[int] = None) -> np.ndarray:
+        """
+        FVG条件はセットアップに依存しないため、範囲内の該当位置（3本目）をまとめて求める
+        全セットアップ分を一度に計算しておけば、セットアップごとの再走査が不要になる
+        """
+        end_idx = len(df_daily) if end_idx is None else min(end_idx, len(df_daily))
+        return _scan_fvg_nb(
+            df_daily['open'].to_numpy(dtype=np.float64),
+            df_daily['high'].to_numpy(dtype=np.float64),
+            df_daily['low'].to_numpy(dtype=np.float64),
+            df_daily['close'].to_numpy(dtype=np.float64),
+            df_daily['sma200'].to_numpy(dtype=np.float64),
+            df_daily['ema200'].to_numpy(dtype=np.float64),
+            start_idx, end_idx, FVG_MIN_GAP_PERCENTAGE, PROXIMITY_PERCENTAGE, FVG_ZONE_PROXIMITY
+        )
 
-            # MA近接条件チェック（bot_hwb.py方式）
-            if not self._check_fvg_ma_proximity(candle_3, candle_1):
-                continue
+    def detect_fvgs_in_range(self, df_daily: pd.DataFrame, setup: Dict, start_idx: int, end_idx: int,
+                             fvg_candidates: Optional[np.ndarray] = None) -> List[Dict]:
+        """[start_idx, end_idx) の範囲でFVG検出（fvg_candidates 指定時はその範囲を切り出すだけ）"""
+        fvgs = []
+        end_idx = min(end_idx, len(df_daily))
+        if start_idx >= end_idx:
+            return fvgs
+
+        if fvg_candidates is None:
+            hits = self.find_fvg_candidates(df_daily, start_idx, end_idx)
+        else:
+            lo, hi = np.searchsorted(fvg_candidates, [start_idx, end_idx])
+            hits = fvg_candidates[lo:hi]
+        if len(hits) == 0:
+            return fvgs
 
-            # FVGとして認識（スコア不要）
+        high = df_daily['high'].to_numpy(dtype=np.float64)
+        low = df_daily['low'].to_numpy(dtype=np.float64)
+
+        # FVGとして認識（スコア不要）
+        for i in hits:
             fvg = {
                 'id': str(uuid.uuid4()),
                 'setup_id': setup['id'],
                 'formation_date': df_daily.index[i],
-                'gap_percentage': gap_percentage,
-                'lower_bound': candle_1['high'],
-                'upper_bound': candle_3['low'],
+                'gap_percentage': (low[i] - high[i - 2]) / high[i - 2],
+                'lower_bound': high[i - 2],
+                'upper_bound': low[i],
                 'status': 'active'
             }
             fvgs.append(fvg)
@@ -265,7 +309,8 @@ class HWBAnalyzer:
         self, 
         df_daily: pd.DataFrame, 
         setup: Dict, 
-        fvg: Dict
+        fvg: Dict,
+        suffix_low: Optional[tuple] = None
     ) -> Optional[Dict]:
         """
         Rule ④: ブレイクアウト検出（bot_hwb.py方式、スコアリング削除）
@@ -274,6 +319,8 @@ class HWBAnalyzer:
         1. レジスタンス = セットアップ〜FVG間の最高値
         2. 終値 > レジスタンス * (1 + 0.1%)
         3. FVG下限が破られていない
+
+        suffix_low: suffix_low_min の結果（複数FVGで使い回す場合に指定）
         """
         try:
             setup_idx = df_daily.index.get_loc(setup['date'])
@@ -281,58 +328,85 @@ class HWBAnalyzer:
         except KeyError:
             return None
 
-        # レジスタンスレベル計算（bot_hwb.py方式：単純な最高値）
-        resistance_start_idx = setup_idx + 1
-        resistance_end_idx = fvg_idx
-        
-        if resistance_end_idx <= resistance_start_idx:
-            resistance_start_idx = max(0, setup_idx - 10)
-            resistance_end_idx = setup_idx + 1
-        
-        resistance_data = df_daily.iloc[resistance_start_idx:resistance_end_idx]
-        
-        if resistance_data.empty:
+        # 行ごとの iloc を避け、列をNumPy配列として扱う
+        high = df_daily['high'].to_numpy(dtype=np.float64)
+        resistance_high = self._resistance_high(high, setup_idx, fvg_idx)
+        if resistance_high is None:
             return None
 
-        # シンプルな最高値をレジスタンスとする
-        resistance_high = resistance_data['high'].max()
-
-        # FVG違反チェック
-        post_fvg_data = df_daily.iloc[fvg_idx:]
-        if post_fvg_data['low'].min() < fvg['lower_bound'] * 0.98:
+        # FVG違反チェック（FVG形成日以降の最安値とその位置）
+        min_low, min_pos = suffix_low if suffix_low is not None else self.suffix_low_min(df_daily)
+        if min_low[fvg_idx] < fvg['lower_bound'] * 0.98:
             return {
                 'status': 'violated', 
-                'violated_date': post_fvg_data['low'].idxmin()
+                'violated_date': df_daily.index[min_pos[fvg_idx]]
             }
 
         # ブレイクアウトチェック（FVG形成日から現在まで、固定閾値0.1%）
-        for i in range(fvg_idx + 1, len(df_daily)):
-            current = df_daily.iloc[i]
+        return self.find_breakout(df_daily, resistance_high, fvg_idx + 1, len(df_daily))
 
-            # bot_hwb.py方式：固定閾値0.1%
-            if current['close'] > resistance_high * (1 + BREAKOUT_THRESHOLD):
-                breakout_date = df_daily.index[i]
+    @staticmethod
+    def suffix_low_min(df_daily: pd.DataFrame) -> tuple:
+        """
+        各位置 i について low[i:] の最安値と、それが最初に現れる位置を一括計算
+        （FVGごとに low[fvg_idx:] を走査し直さないよう、銘柄ごとに一度だけ求める）
+        NaNは無視し、以降がすべてNaNの位置の最安値はNaN
+        """
+        low = df_daily['low'].to_numpy(dtype=np.float64)
+        n = len(low)
+        min_low = np.fmin.accumulate(low[::-1])[::-1]
+        # 最安値と一致する位置のうち、i 以降で最初のもの（その間の足はすべて最安値より高い）
+        is_min = low == min_low
+        pos = np.where(is_min, np.arange(n), n)
+        min_pos = np.minimum.accumulate(pos[::-1])[::-1]
+        return min_low, min_pos
+
+    @staticmethod
+    def _resistance_high(high: np.ndarray, setup_idx: int, fvg_idx: int) -> Optional[float]:
+        """レジスタンスレベル計算（bot_hwb.py方式：セットアップ〜FVG間の単純な最高値）"""
+        resistance_start_idx = setup_idx + 1
+        resistance_end_idx = fvg_idx
+        
+        if resistance_end_idx <= resistance_start_idx:
+            resistance_start_idx = max(0, setup_idx - 10)
+            resistance_end_idx = setup_idx + 1
+        
+        resistance_data = high[resistance_start_idx:resistance_end_idx]
+        if len(resistance_data) == 0:
+            return None
+        # fmax はNaNを無視し、全てNaNならNaNを返す（警告フィルタを触らずスレッド間で安全）
+        return np.fmax.reduce(resistance_data)
+
+    def find_breakout(self, df_daily: pd.DataFrame, resistance_high: float,
+                      start_idx: int, end_idx: int) -> Optional[Dict]:
+        """[start_idx, end_idx) で終値が初めてレジスタンスを上抜けた日をブレイクアウトとして返す"""
+        close = df_daily['close'].to_numpy(dtype=np.float64)
+        # bot_hwb.py方式：固定閾値0.1%
+        above = np.flatnonzero(close[start_idx:end_idx] > resistance_high * (1 + BREAKOUT_THRESHOLD))
+        if len(above) == 0:
+            return None
 
-                # 出来高増加率を計算
-                volume_metrics = self._calculate_volume_increase_at_date(df_daily, breakout_date)
+        i = start_idx + above[0]
+        breakout_date = df_daily.index[i]
 
-                result = {
-                    'status': 'breakout',
-                    'breakout_date': breakout_date,
-                    'breakout_price': current['close'],
-                    'resistance_price': resistance_high,
-                    'breakout_percentage': (current['close'] / resistance_high - 1) * 100
-                }
+        # 出来高増加率を計算
+        volume_metrics = self._calculate_volume_increase_at_date(df_daily, breakout_date)
 
-                # 出来高情報を追加
-                if volume_metrics:
-                    result['breakout_volume'] = volume_metrics['breakout_volume']
-                    result['avg_volume_20d'] = volume_metrics['avg_volume_20d']
-                    result['volume_increase_pct'] = volume_metrics['volume_increase_pct']
+        result = {
+            'status': 'breakout',
+            'breakout_date': breakout_date,
+            'breakout_price': close[i],
+            'resistance_price': resistance_high,
+            'breakout_percentage': (close[i] / resistance_high - 1) * 100
+        }
 
-                return result
+        # 出来高情報を追加
+        if volume_metrics:
+            result['breakout_volume'] = volume_metrics['breakout_volume']
+            result['avg_volume_20d'] = volume_metrics['avg_volume_20d']
+            result['volume_increase_pct'] = volume_metrics['volume_increase_pct']
 
-        return None
+        return result
 
     def _calculate_volume_increase_at_date(self, df_daily: pd.DataFrame, target_date: pd.Timestamp) -> Optional[Dict]:
         """
@@ -355,19 +429,19 @@ class HWBAnalyzer:
                 logger.warning(f"'volume' column not found in dataframe. Available columns: {df_daily.columns.tolist()}")
                 return None
 
-            # target_date以前のデータを取得
-            df_historical = df_daily[df_daily.index <= target_date].copy()
+            # target_date以前のデータ（日付順のインデックス上の位置で切り出し、コピーしない）
+            volume = df_daily['volume'].to_numpy(dtype=np.float64)[:df_daily.index.searchsorted(target_date, side='right')]
 
             # 最低21日のデータが必要（20日平均を計算するため）
-            if len(df_historical) < 21:
+            if len(volume) < 21:
                 logger.debug(f"Insufficient data for volume calculation at {target_date}")
                 return None
 
             # ブレイクアウト日の出来高
-            breakout_volume = df_historical.iloc[-1]['volume']
+            breakout_volume = volume[-1]
 
             # 20日平均出来高（ブレイクアウト日の前日までの20日間）
-            avg_volume_20d = df_historical.iloc[-21:-1]['volume'].mean()
+            avg_volume_20d = np.nanmean(volume[-21:-1])
 
             if avg_volume_20d == 0 or pd.isna(avg_volume_20d):
                 logger.warning(f"Invalid average volume at {target_date}")
@@ -396,10 +470,12 @@ class HWBScanner:
         self.data_manager = HWBDataManager()
         self.analyzer = HWBAnalyzer()
         self.benchmark_df = None  # ベンチマークデータをキャッシュ
+        self.benchmark_date = None  # ベンチマークを読み込んだ日付（インスタンスを使い回すため日付が変われば再取得）
 
     def _get_benchmark_data(self):
         """S&P500（SPY）データをベンチマークとして取得"""
-        if self.benchmark_df is not None:
+        today = datetime.now().date()
+        if self.benchmark_df is not None and self.benchmark_date == today:
             return self.benchmark_df
 
         try:
@@ -407,6 +483,7 @@ class HWBScanner:
             data = self.data_manager.get_stock_data_with_cache('SPY', lookback_years=10)
             if data:
                 self.benchmark_df, _ = data
+                self.benchmark_date = today
                 logger.info(f"Benchmark data loaded: {len(self.benchmark_df)} days")
             return self.benchmark_df
         except Exception as e:
@@ -457,35 +534,57 @@ class HWBScanner:
 
         all_results = []
         processed_count = 0
-        
-        for i in range(0, total, BATCH_SIZE):
-            batch = symbols[i:i + BATCH_SIZE]
+
+        async def collect(future_to_symbol: Dict[concurrent.futures.Future, str]):
+            nonlocal processed_count
+            for future in concurrent.futures.as_completed(future_to_symbol):
+                processed_count += 1
+                try:
+                    result = future.result()
+                    if result:
+                        all_results.extend(result)
+                except Exception as exc:
+                    logger.error(f"エラー: {future_to_symbol[future]} - {exc}", exc_info=True)
+                if progress_callback:
+                    await progress_callback(processed_count, total)
+
+        # ワーカースレッドから同時にダウンロードされないよう、ベンチマークを先に読み込む
+        self._get_benchmark_data()
+
+        # Rule ①は週足だけで判定できるため、読み込み時に先に週足で判定し、
+        # 条件を満たさない銘柄は日足（全期間）の読み込み自体を省く
+        def passes_rule1(df_weekly: pd.DataFrame) -> bool:
+            return self.analyzer.optimized_rule1(None, df_weekly)
+
+        # バッチ単位でyf.downloadによる一括取得（次バッチはバックグラウンドで先読み）
+        # 取得できなかった銘柄・Rule ①で除外された銘柄は空タプルを渡し、再取得しない
+        # スレッドプールはスキャン全体で1つだけ作成し、前バッチの処理待ちと次バッチの分析を重ねる
+        # 途中で例外が発生しても、キュー済みの分析結果は書き込んでから抜ける
+        try:
             with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                future_to_symbol = {
-                    executor.submit(self._analyze_and_save_symbol, symbol): symbol 
-                    for symbol in batch
-                }
-                for future in concurrent.futures.as_completed(future_to_symbol):
-                    processed_count += 1
-                    try:
-                        result = future.result()
-                        if result:
-                            all_results.extend(result)
-                    except Exception as exc:
-                        logger.error(f"エラー: {future_to_symbol[future]} - {exc}", exc_info=True)
-                    if progress_callback:
-                        await progress_callback(processed_count, total)
-            await asyncio.sleep(0.1)
+                in_flight: Dict[concurrent.futures.Future, str] = {}
+                for batch, batch_data in self.data_manager.iter_stock_data_batches(symbols, BATCH_SIZE,
+                                                                                  weekly_filter=passes_rule1):
+                    submitted = {
+                        executor.submit(self._analyze_and_save_symbol, symbol, batch_data.get(symbol, ())): symbol
+                        for symbol in batch
+                    }
+                    await collect(in_flight)
+                    in_flight = submitted
+                await collect(in_flight)
+        finally:
+            self.data_manager.flush_symbol_data()
 
         summary = self._create_daily_summary(all_results, total, scan_start_time)
         self.data_manager.save_daily_summary(summary)
         logger.info("スキャン完了")
         return summary
 
-    def _analyze_and_save_symbol(self, symbol: str) -> Optional[List[Dict]]:
+    def _analyze_and_save_symbol(self, symbol: str, data: Optional[tuple] = None) -> Optional[List[Dict]]:
         """単一銘柄分析（状態ベース差分処理版）"""
         try:
-            data = self.data_manager.get_stock_data_with_cache(symbol)
+            if data is None:
+                data = self.data_manager.get_stock_data_with_cache(symbol)
             if not data:
                 return None
             
@@ -493,10 +592,8 @@ class HWBScanner:
             if df_daily.empty or df_weekly.empty:
                 return None
 
-            df_daily.index = pd.to_datetime(df_daily.index)
-            df_weekly.index = pd.to_datetime(df_weekly.index)
-            df_daily = df_daily[~df_daily.index.duplicated(keep='last')]
-            df_weekly = df_weekly[~df_weekly.index.duplicated(keep='last')]
+            df_daily = self._normalize_index(df_daily)
+            df_weekly = self._normalize_index(df_weekly)
 
             latest_market_date = df_daily.index[-1].date()
 
@@ -518,6 +615,18 @@ class HWBScanner:
             logger.error(f"分析エラー: {symbol} - {e}", exc_info=True)
             return None
 
+    @staticmethod
+    def _normalize_index(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        DatetimeIndex化と重複日付の除去（呼び出し元のDataFrameは変更しない）
+        DBから読み込んだデータは既に一意な DatetimeIndex のため、通常はそのまま返す
+        """
+        if not isinstance(df.index, pd.DatetimeIndex):
+            df = df.set_axis(pd.to_datetime(df.index), axis=0)
+        if not df.index.is_unique:
+            df = df[~df.index.duplicated(keep='last')]
+        return df
+
     def _differential_analysis(self, symbol: str, df_daily: pd.DataFrame, df_weekly: pd.DataFrame,
                               existing_data: dict, latest_market_date: datetime.date) -> Optional[List[Dict]]:
         """差分分析（RS Rating追加版）"""
@@ -525,18 +634,19 @@ class HWBScanner:
         existing_fvgs = existing_data.get('fvgs', [])
         existing_signals = existing_data.get('signals', [])
         
+        # スカラーの日付文字列は pd.to_datetime より pd.Timestamp の方がはるかに速い
         for item in existing_setups + existing_fvgs + existing_signals:
             if 'date' in item:
-                item['date'] = pd.to_datetime(item['date'])
+                item['date'] = pd.Timestamp(item['date'])
             if 'formation_date' in item:
-                item['formation_date'] = pd.to_datetime(item['formation_date'])
+                item['formation_date'] = pd.Timestamp(item['formation_date'])
             if 'breakout_date' in item:
-                item['breakout_date'] = pd.to_datetime(item['breakout_date'])
+                item['breakout_date'] = pd.Timestamp(item['breakout_date'])
         
         active_setups = [s for s in existing_setups if s.get('status') == 'active']
         active_fvgs = [f for f in existing_fvgs if f.get('status') == 'active']
         
-        last_analyzed_date = pd.to_datetime(existing_data.get('last_updated', '2000-01-01')).date()
+        last_analyzed_date = pd.Timestamp(existing_data.get('last_updated', '2000-01-01')).date()
         
         if latest_market_date <= last_analyzed_date:
             logger.debug(f"{symbol}: 新しいデータなし")
@@ -546,14 +656,27 @@ class HWBScanner:
         
         updated = False
         new_fvgs_found = []
+
+        # セットアップID → FVG一覧（セットアップごとに全FVGを走査しないよう一度だけ作成）
+        fvgs_by_setup: Dict[str, List[Dict]] = {}
+        for f in existing_fvgs:
+            fvgs_by_setup.setdefault(f.get('setup_id'), []).append(f)
+
+        # 前回分析以降の最初の足の位置（全セットアップ・FVGで共通のため一度だけ求める）
+        new_data_start = df_daily.index.searchsorted(pd.Timestamp(last_analyzed_date) + pd.Timedelta(days=1))
         
         # アクティブセットアップからFVG探索
         if active_setups:
             for setup in active_setups:
                 setup_date = setup['date']
                 setup_idx = df_daily.index.get_loc(setup_date)
+
+                # FVG探索期間が新しい足に届かない古いセットアップは、既存FVGを調べる前にスキップ
+                search_end = min(setup_idx + FVG_MAX_SEARCH_DAYS, len(df_daily) - 1)
+                if new_data_start >= search_end:
+                    continue
                 
-                setup_fvgs = [f for f in existing_fvgs if f.get('setup_id') == setup['id']]
+                setup_fvgs = fvgs_by_setup.get(setup['id'], [])
                 if setup_fvgs:
                     last_fvg_date = max(f['formation_date'] for f in setup_fvgs)
                     search_start_date = last_fvg_date + pd.Timedelta(days=1)
@@ -561,8 +684,6 @@ class HWBScanner:
                 else:
                     search_start = setup_idx + 2
                 
-                search_end = min(setup_idx + FVG_MAX_SEARCH_DAYS, len(df_daily) - 1)
-                new_data_start = df_daily.index.searchsorted(pd.Timestamp(last_analyzed_date) + pd.Timedelta(days=1))
                 search_start = max(search_start, new_data_start)
                 
                 if search_start >= search_end:
@@ -572,6 +693,7 @@ class HWBScanner:
                 
                 if new_fvgs:
                     existing_data['fvgs'].extend(new_fvgs)
+                    fvgs_by_setup.setdefault(setup['id'], []).extend(new_fvgs)
                     new_fvgs_found.extend(new_fvgs)
                     updated = True
         
@@ -579,14 +701,17 @@ class HWBScanner:
         all_active_fvgs = active_fvgs + new_fvgs_found
         
         if all_active_fvgs:
+            # セットアップID → セットアップ（同一IDが複数ある場合は従来どおり最初のものを使う）
+            setup_by_id: Dict[str, Dict] = {}
+            for s in existing_setups:
+                setup_by_id.setdefault(s['id'], s)
             for fvg in all_active_fvgs:
-                setup = next((s for s in existing_setups if s['id'] == fvg['setup_id']), None)
+                setup = setup_by_id.get(fvg['setup_id'])
                 if not setup or setup.get('status') == 'consumed':
                     continue
                 
                 fvg_date = fvg['formation_date']
                 fvg_idx = df_daily.index.get_loc(fvg_date)
-                new_data_start = df_daily.index.searchsorted(pd.Timestamp(last_analyzed_date) + pd.Timedelta(days=1))
                 check_start = max(fvg_idx + 1, new_data_start)
                 
                 if check_start >= len(df_daily):
@@ -596,7 +721,7 @@ class HWBScanner:
                 
                 if breakout and breakout.get('status') == 'breakout':
                     # ✅ RS Ratingを計算
-                    breakout_date = pd.to_datetime(breakout['breakout_date'])
+                    breakout_date = pd.Timestamp(breakout['breakout_date'])
                     rs_rating = self._calculate_rs_rating_at_date(df_daily, breakout_date)
 
                     signal = {**fvg, **breakout}
@@ -607,9 +732,8 @@ class HWBScanner:
                     existing_data['signals'].append(signal)
                     
                     setup['status'] = 'consumed'
-                    for related_fvg in existing_data['fvgs']:
-                        if related_fvg.get('setup_id') == setup['id']:
-                            related_fvg['status'] = 'consumed'
+                    for related_fvg in fvgs_by_setup.get(setup['id'], []):
+                        related_fvg['status'] = 'consumed'
                     
                     updated = True
                     break
@@ -653,14 +777,19 @@ class HWBScanner:
         all_signals = []
 
         for s in setups:
-            s['date'] = pd.to_datetime(s['date'])
+            s['date'] = pd.Timestamp(s['date'])
+
+        # FVG候補は全期間で一度だけ計算し、各セットアップの探索範囲で切り出す
+        fvg_candidates = self.analyzer.find_fvg_candidates(df_daily)
+        # FVG違反チェック用の以降最安値も全FVG共通のため一度だけ計算
+        suffix_low = self.analyzer.suffix_low_min(df_daily)
 
         for setup in setups:
             if setup['id'] in consumed_setups:
                 setup['status'] = 'consumed'
                 continue
 
-            fvgs = self.analyzer.optimized_fvg_detection(df_daily, setup)
+            fvgs = self.analyzer.optimized_fvg_detection(df_daily, setup, fvg_candidates)
             signal_found_for_this_setup = False
             
             for fvg in fvgs:
@@ -669,12 +798,12 @@ class HWBScanner:
                     all_fvgs.append(fvg)
                     continue
 
-                breakout = self.analyzer.optimized_breakout_detection_all_periods(df_daily, setup, fvg)
+                breakout = self.analyzer.optimized_breakout_detection_all_periods(df_daily, setup, fvg, suffix_low)
 
                 if breakout:
                     if breakout.get('status') == 'breakout':
                         # ✅ RS Ratingを計算（ブレイクアウト時点）
-                        breakout_date = pd.to_datetime(breakout['breakout_date'])
+                        breakout_date = pd.Timestamp(breakout['breakout_date'])
                         rs_rating = self._calculate_rs_rating_at_date(df_daily, breakout_date)
 
                         signal = {**fvg, **breakout}
@@ -705,10 +834,16 @@ class HWBScanner:
             logger.info(f"{symbol}: アクティブなFVG/シグナルなし")
             return None
 
+        # セットアップ・FVG・シグナルで同じ日付が繰り返し現れるため、日付文字列をメモ化する
+        date_strs: Dict[pd.Timestamp, str] = {}
+
         def stringify_dates(d):
             for k, v in d.items():
                 if isinstance(v, pd.Timestamp):
-                    d[k] = v.strftime('%Y-%m-%d')
+                    date_str = date_strs.get(v)
+                    if date_str is None:
+                        date_str = date_strs[v] = v.strftime('%Y-%m-%d')
+                    d[k] = date_str
             return d
 
         symbol_data = {
@@ -730,38 +865,7 @@ class HWBScanner:
 
     def _detect_fvg_in_range(self, df_daily: pd.DataFrame, setup: Dict, start_idx: int, end_idx: int) -> List[Dict]:
         """指定範囲内でFVG検出（bot_hwb.py方式）"""
-        fvgs = []
-        
-        for i in range(start_idx, end_idx):
-            if i < 2:
-                continue
-            
-            candle_1 = df_daily.iloc[i-2]
-            candle_3 = df_daily.iloc[i]
-            
-            if candle_3['low'] <= candle_1['high']:
-                continue
-            
-            gap_percentage = (candle_3['low'] - candle_1['high']) / candle_1['high']
-            if gap_percentage < FVG_MIN_GAP_PERCENTAGE:
-                continue
-            
-            # MA近接条件チェック（bot_hwb.py方式）
-            if not self.analyzer._check_fvg_ma_proximity(candle_3, candle_1):
-                continue
-            
-            fvg = {
-                'id': str(uuid.uuid4()),
-                'setup_id': setup['id'],
-                'formation_date': df_daily.index[i],
-                'gap_percentage': gap_percentage,
-                'lower_bound': candle_1['high'],
-                'upper_bound': candle_3['low'],
-                'status': 'active'
-            }
-            fvgs.append(fvg)
-        
-        return fvgs
+        return self.analyzer.detect_fvgs_in_range(df_daily, setup, start_idx, end_idx)
 
     def _check_breakout_in_range(self, df_daily: pd.DataFrame, setup: Dict, fvg: Dict,
                                  start_idx: int, end_idx: int) -> Optional[Dict]:
@@ -772,45 +876,11 @@ class HWBScanner:
         except KeyError:
             return None
         
-        resistance_start_idx = setup_idx + 1
-        resistance_end_idx = fvg_idx
-        
-        if resistance_end_idx <= resistance_start_idx:
-            resistance_start_idx = max(0, setup_idx - 10)
-            resistance_end_idx = setup_idx + 1
-        
-        resistance_data = df_daily.iloc[resistance_start_idx:resistance_end_idx]
-        
-        if resistance_data.empty:
+        resistance_high = self.analyzer._resistance_high(df_daily['high'].to_numpy(dtype=np.float64), setup_idx, fvg_idx)
+        if resistance_high is None:
             return None
         
-        resistance_high = resistance_data['high'].max()
-        
-        for i in range(start_idx, end_idx):
-            current = df_daily.iloc[i]
-            if current['close'] > resistance_high * (1 + BREAKOUT_THRESHOLD):
-                breakout_date = df_daily.index[i]
-
-                # 出来高増加率を計算
-                volume_metrics = self.analyzer._calculate_volume_increase_at_date(df_daily, breakout_date)
-
-                result = {
-                    'status': 'breakout',
-                    'breakout_date': breakout_date,
-                    'breakout_price': current['close'],
-                    'resistance_price': resistance_high,
-                    'breakout_percentage': (current['close'] / resistance_high - 1) * 100
-                }
-
-                # 出来高情報を追加
-                if volume_metrics:
-                    result['breakout_volume'] = volume_metrics['breakout_volume']
-                    result['avg_volume_20d'] = volume_metrics['avg_volume_20d']
-                    result['volume_increase_pct'] = volume_metrics['volume_increase_pct']
-
-                return result
-
-        return None
+        return self.analyzer.find_breakout(df_daily, resistance_high, start_idx, end_idx)
 
     def _create_summary_from_data(self, symbol: str, signals: list, fvgs: list,
                                  latest_market_date: datetime.date) -> List[Dict]:
@@ -830,7 +900,7 @@ class HWBScanner:
             breakout_date_str = signal.get('breakout_date')
             if breakout_date_str:
                 try:
-                    breakout_date = pd.to_datetime(breakout_date_str).date()
+                    breakout_date = pd.Timestamp(breakout_date_str).date()
 
                     summary_item = {
                         "symbol": symbol,
@@ -868,7 +938,7 @@ class HWBScanner:
                 formation_date_str = fvg.get('formation_date')
                 if formation_date_str:
                     try:
-                        formation_date = pd.to_datetime(formation_date_str).date()
+                        formation_date = pd.Timestamp(formation_date_str).date()
 
                         if five_business_days_ago <= formation_date <= today:
                             summary_results.append({
@@ -910,62 +980,50 @@ class HWBScanner:
             chart_data = self._generate_lightweight_chart_data(symbol_data, df_daily, df_weekly)
             symbol_data['chart_data'] = chart_data
 
-            # データ保存
-            self.data_manager.save_symbol_data(symbol, symbol_data)
-            logger.info(f"✅ Saved data for {symbol}")
+            # データ保存（書き込みはバックグラウンドのライタースレッドでまとめてコミット）
+            self.data_manager.enqueue_symbol_data(symbol, symbol_data)
+            logger.info(f"✅ Queued data for {symbol}")
         except Exception as e:
             logger.error(f"Failed to save data for {symbol}: {e}", exc_info=True)
 
     def _generate_lightweight_chart_data(self, symbol_data: dict, df_daily: pd.DataFrame, df_weekly: pd.DataFrame) -> dict:
         """チャートデータ生成"""
-        df_plot = df_daily.copy()
-        df_plot['weekly_sma200_val'] = df_weekly['sma200'].reindex(df_plot.index, method='ffill')
-
-        def format_series(df, col):
-            s = df[[col]].dropna()
-            return [{"time": i.strftime('%Y-%m-%d'), "value": r[col]} for i, r in s.iterrows()]
-
-        def clean_np_types(d):
-            for k, v in d.items():
-                if isinstance(v, (np.int64, np.int32)):
-                    d[k] = int(v)
-                if isinstance(v, (np.float64, np.float32)):
-                    d[k] = float(v)
-            return d
-
-        candles = [{
-            "time": i.strftime('%Y-%m-%d'),
-            "open": r.open,
-            "high": r.high,
-            "low": r.low,
-            "close": r.close
-        } for i, r in df_plot.iterrows()]
-
-        volume_data = []
-        for i, r in df_plot.iterrows():
-            color = '#26a69a' if r['close'] >= r['open'] else '#ef5350'
-            volume_data.append({
-                "time": i.strftime('%Y-%m-%d'),
-                "value": r['volume'],
-                "color": color
-            })
+        # 日付文字列と各列は一度だけ変換し、行ごとの iterrows / strftime を避ける
+        times = df_daily.index.strftime('%Y-%m-%d').tolist()
+        open_ = df_daily['open'].tolist()
+        close = df_daily['close'].tolist()
+
+        def format_series(values: np.ndarray):
+            values = np.asarray(values, dtype=np.float64)
+            valid = (~np.isnan(values)).tolist()
+            return [{"time": t, "value": v} for t, v, ok in zip(times, values.tolist(), valid) if ok]
+
+        candles = [
+            {"time": t, "open": o, "high": h, "low": l, "close": c}
+            for t, o, h, l, c in zip(times, open_, df_daily['high'].tolist(), df_daily['low'].tolist(), close)
+        ]
+
+        # 出来高は従来どおり float で出力（iterrows が行を float64 に揃えていたため）
+        volume_data = [
+            {"time": t, "value": v, "color": '#26a69a' if c >= o else '#ef5350'}
+            for t, v, o, c in zip(times, df_daily['volume'].astype(np.float64).tolist(), open_, close)
+        ]
 
         markers = []
 
         for fvg in symbol_data.get('fvgs', []):
             try:
-                formation_date = pd.to_datetime(fvg['formation_date'])
-                if formation_date in df_plot.index:
-                    formation_idx = df_plot.index.get_loc(formation_date)
+                formation_date = pd.Timestamp(fvg['formation_date'])
+                if formation_date in df_daily.index:
+                    formation_idx = df_daily.index.get_loc(formation_date)
                     if formation_idx >= 1:
-                        middle_candle_date = df_plot.index[formation_idx - 1]
                         color_map = {
                             'active': '#FFD700',
                             'consumed': '#9370DB',
                             'violated': '#808080'
                         }
                         markers.append({
-                            "time": middle_candle_date.strftime('%Y-%m-%d'),
+                            "time": times[formation_idx - 1],
                             "position": "inBar",
                             "color": color_map.get(fvg.get('status'), '#FFD700'),
                             "shape": "circle",
@@ -985,11 +1043,11 @@ class HWBScanner:
 
         return {
             'candles': candles,
-            'sma200': format_series(df_plot, 'sma200'),
-            'ema200': format_series(df_plot, 'ema200'),
-            'weekly_sma200': format_series(df_plot, 'weekly_sma200_val'),
-            'volume': [clean_np_types(v) for v in volume_data],
-            'markers': [clean_np_types(m) for m in markers]
+            'sma200': format_series(df_daily['sma200']),
+            'ema200': format_series(df_daily['ema200']),
+            'weekly_sma200': format_series(df_weekly['sma200'].reindex(df_daily.index, method='ffill')),
+            'volume': volume_data,
+            'markers': markers
         }
 
     def _create_daily_summary(self, results: List[Dict], total_scanned: int, start_time: datetime) -> Dict:
@@ -1036,9 +1094,27 @@ class HWBScanner:
         }
 
 
+_scanner: Optional[HWBScanner] = None
+_scanner_lock = threading.Lock()
+
+
+def get_scanner() -> HWBScanner:
+    """
+    プロセス内で共有するスキャナーを返す
+    （DB接続・フレームキャッシュ・ベンチマークをリクエスト間で使い回す）
+    APIの同期エンドポイントはスレッドプールから呼ばれるため、生成はロックで一度だけ行う
+    """
+    global _scanner
+    if _scanner is None:
+        with _scanner_lock:
+            if _scanner is None:
+                _scanner = HWBScanner()
+    return _scanner
+
+
 async def run_hwb_scan(progress_callback=None):
     """スキャン実行エントリーポイント"""
-    scanner = HWBScanner()
+    scanner = get_scanner()
     summary = await scanner.scan_all_symbols(progress_callback)
     
     logger.info(
@@ -1051,6 +1127,7 @@ async def run_hwb_scan(progress_callback=None):
 
 async def analyze_single_ticker(symbol: str) -> Optional[Dict]:
     """単一銘柄分析"""
-    scanner = HWBScanner()
+    scanner = get_scanner()
     scanner._analyze_and_save_symbol(symbol)
+    scanner.data_manager.flush_symbol_data()
     return scanner.data_manager.load_symbol_data(symbol)
\ No newline at end of file
@@ -15,10 +15,9 @@ from typing import Dict, Any, Optional
 
 # Import security manager
 from .security_manager import security_manager
-from .hwb_data_manager import HWBDataManager
 
 # 既存のインポートに追加
-from .hwb_scanner import run_hwb_scan, analyze_single_ticker
+from .hwb_scanner import run_hwb_scan, analyze_single_ticker, get_scanner
 import asyncio
 
 # Setup logging
@@ -398,12 +397,13 @@ def get_hwb_symbol_data(symbol: str, current_user: str = Depends(get_current_use
         if not re.match(r'^[A-Z0-9\-\.]+$', symbol.upper()):
             raise HTTPException(status_code=400, detail="Invalid symbol format.")
 
-        symbol_path = os.path.join(DATA_DIR, 'hwb', 'symbols', f"{symbol.upper()}.json")
-        if not os.path.exists(symbol_path):
+        # Reuse the process-wide manager instead of re-initializing the DB per request
+        data_manager = get_scanner().data_manager
+        symbol_data = data_manager.load_symbol_data(symbol.upper())
+        if symbol_data is None:
             raise HTTPException(status_code=404, detail=f"Data for symbol '{symbol}' not found.")
 
-        with open(symbol_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return symbol_data
     except HTTPException:
         raise
     except Exception as e:
@@ -423,7 +423,7 @@ async def analyze_ticker(ticker: str, force: bool = False, current_user: str = D
 
     try:
         symbol = ticker.strip().upper()
-        data_manager = HWBDataManager()
+        data_manager = get_scanner().data_manager
 
         if not force:
             logger.info(f"Attempting to load cached data for {symbol}...")